@@ -15,7 +15,7 @@ from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from fastapi.responses import JSONResponse
 from datetime import datetime, timedelta
-from services.email_services import EmailService
+from services.email_services import email_service
 import jwt
 import random
 import os
@@ -36,7 +36,6 @@ logger = logging.getLogger(__name__)
 # Configure the password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-email_service = EmailService()
 helpers = HelperUtils()
 
 class AuthController:
@@ -98,8 +97,8 @@ class AuthController:
             db.commit()
             db.refresh(new_user)
             
-            # send welcome email
-            email_service.send_welcome_email(new_user.email, new_user.username)
+            # send welcome email without holding up the response
+            email_service.send_in_background(email_service.send_welcome_email, new_user.email, new_user.username)
 
             # Create a UserRead instance to return
             user_response = UserRead(
@@ -363,6 +362,17 @@ class AuthController:
                 
             send_email_request = email_service.send_OTP_via_SMTP(otp_data.email, otp)
 
+            if send_email_request.get("status") == "throttled":
+                # A code went out moments ago; keep that one as the stored OTP
+                return JSONResponse(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    content=AuthResponse(
+                        status="error",
+                        message="OTP recently sent",
+                        payload=f"{send_email_request.get('message')}"
+                    ).dict()
+                )
+
             if send_email_request.get("status") != "success":
                 return JSONResponse(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
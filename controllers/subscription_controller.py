@@ -1,13 +1,14 @@
 from datetime import datetime, timedelta
+import orjson
 from fastapi import HTTPException, status, Header
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
 
 from models.subscription_model import SubscriptionModel
 from models.membership_model import MembershipModel
 from schemas.subscription_schema import (
     SubscriptionCreate, SubscriptionRead, SubscriptionUpgrade, SubscriptionCancel,
-    SubscriptionStatusCheck, SubscriptionStatusResponse,
+    SubscriptionStatusCheck, SubscriptionStatusResponseLite,
     CreateSubscriptionResponse, RetrieveSubscriptionResponse, UpdateSubscriptionResponse, CancelSubscriptionResponse
 )
 from utils.enums import SubscriptionStatus
@@ -127,12 +128,15 @@ class SubscriptionController:
             ).first()
             
             if not subscription:
-                return SubscriptionStatusResponse(
-                    has_active_subscription=False,
-                    subscription_status=None,
-                    days_remaining=None,
-                    features_available=False,
-                    message="No subscription found. Please start your free trial."
+                return Response(
+                    content=orjson.dumps(SubscriptionStatusResponseLite(
+                        has_active_subscription=False,
+                        subscription_status=None,
+                        days_remaining=None,
+                        features_available=False,
+                        message="No subscription found. Please start your free trial."
+                    )),
+                    media_type="application/json"
                 )
             
             now = datetime.utcnow()
@@ -167,24 +171,28 @@ class SubscriptionController:
                     features_available = False
                     message = "Subscription ended. Renew to restore access."
             
-            return SubscriptionStatusResponse(
-                has_active_subscription=True,
-                subscription_status=subscription.subscription_status,
-                days_remaining=days_remaining if days_remaining > 0 else 0,
-                features_available=features_available,
-                message=message
+            return Response(
+                content=orjson.dumps(SubscriptionStatusResponseLite(
+                    has_active_subscription=True,
+                    subscription_status=subscription.subscription_status.value,
+                    days_remaining=days_remaining if days_remaining > 0 else 0,
+                    features_available=features_available,
+                    message=message
+                )),
+                media_type="application/json"
             )
             
         except Exception as e:
-            return JSONResponse(
+            return Response(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                content={
+                content=orjson.dumps({
                     "has_active_subscription": False,
                     "subscription_status": None,
                     "days_remaining": None,
                     "features_available": False,
                     "message": f"Error checking subscription: {str(e)}"
-                }
+                }),
+                media_type="application/json"
             )
     
     def get_user_subscription(self, user_data: SubscriptionStatusCheck, db: Session, authorization: str = Header(...)):
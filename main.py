@@ -14,6 +14,7 @@ from routes.payment_routes import router as payment_router
 from routes.subscription_routes import router as subscription_router
 from routes.support_routes import router as support_router
 from controllers.helpers.notification_scheduler import NotificationScheduler
+from services.email_services import email_service
 from utils.helper_utils import HelperUtils
 from connect import SessionLocal
 import logging
@@ -49,6 +50,10 @@ async def lifespan(app: FastAPI):
     notification_scheduler.stop()
     logger.info("❌ Notification scheduler stopped")
     print("Notification scheduler stopped")
+    
+    # Flush queued emails and close SMTP sessions
+    email_service.close()
+    logger.info("✅ Email service closed")
 
 app = FastAPI(lifespan=lifespan)
 
@@ -40,8 +40,11 @@ async def authorize_user_account(user: UserAuthorize, db: Session = Depends(get_
     except HTTPException as e:
         return e
 
+# Plain def: token verification refetches Google's signing certs over the network
+# when the cached set expires, so FastAPI runs this in its threadpool instead of on
+# the event loop
 @router.post("/auth/google_oauth_login", response_model=AuthResponse)
-async def google_oauth_login(
+def google_oauth_login(
     google_data: GoogleOAuthRequest,  # FIXED: Use correct schema
     db: Session = Depends(get_db_connection)
 ):
@@ -51,8 +54,10 @@ async def google_oauth_login(
     except HTTPException as e:
         return e
     
+# Plain def: the OTP send blocks on SMTP, so FastAPI runs this in its threadpool
+# instead of on the event loop
 @router.post("/auth/generate_otp", response_model=AuthResponse)
-async def generate_otp_for_password_reset(
+def generate_otp_for_password_reset(
     otp_data: OTPRequest, 
     db: Session = Depends(get_db_connection)
 ):
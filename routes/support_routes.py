@@ -10,9 +10,10 @@ router = APIRouter(
 support_controller = SupportController()
 
 @router.post("/submit", response_model=SupportResponse)
-async def submit_support_request(request: SupportRequest):
+def submit_support_request(request: SupportRequest):
     """
     Submit a help & support request.
     This will send an email to the support team and an acknowledgment to the user.
+    Declared sync so the blocking SMTP sends run in FastAPI's threadpool.
     """
     return support_controller.submit_request(request)
@@ -1,8 +1,15 @@
 import uuid
-from typing import Optional, Union, List
+from dataclasses import dataclass
+from typing import Annotated, Optional, Union, List
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, BeforeValidator, Discriminator, Tag
 from utils.enums import SubscriptionStatus, PaymentMethod
+from utils.schema_utils import payload_kind
+
+# IDs are stored as String(36) columns, so rows already carry canonical UUID
+# strings; read schemas pass them through instead of re-parsing into uuid.UUID.
+# Only real UUID objects are stringified, so None/ints still fail validation.
+UUIDStr = Annotated[str, BeforeValidator(lambda v: str(v) if isinstance(v, uuid.UUID) else v)]
 
 class SubscriptionCreate(BaseModel):
     user_id: uuid.UUID
@@ -17,9 +24,9 @@ class SubscriptionCancel(BaseModel):
     cancellation_reason: Optional[str] = None
 
 class SubscriptionRead(BaseModel):
-    subscription_id: uuid.UUID
-    user_id: uuid.UUID
-    membership_id: uuid.UUID
+    subscription_id: UUIDStr
+    user_id: UUIDStr
+    membership_id: UUIDStr
     subscription_status: SubscriptionStatus
     payment_method: Optional[PaymentMethod] = None
     payment_reference: Optional[str] = None
@@ -44,6 +51,23 @@ class SubscriptionRead(BaseModel):
     class Config:
         from_attributes = True
 
+SubscriptionPayload = Annotated[
+    Union[
+        Annotated[SubscriptionRead, Tag("one")],
+        Annotated[str, Tag("error")],
+    ],
+    Discriminator(payload_kind),
+]
+
+SubscriptionListPayload = Annotated[
+    Union[
+        Annotated[SubscriptionRead, Tag("one")],
+        Annotated[List[SubscriptionRead], Tag("many")],
+        Annotated[str, Tag("error")],
+    ],
+    Discriminator(payload_kind),
+]
+
 class SubscriptionStatusCheck(BaseModel):
     user_id: uuid.UUID
 
@@ -54,22 +78,34 @@ class SubscriptionStatusResponse(BaseModel):
     features_available: bool
     message: str
 
+@dataclass(slots=True)
+class SubscriptionStatusResponseLite:
+    """
+    Plain mirror of SubscriptionStatusResponse for the status check hot path.
+    The pydantic model stays as the route's response_model for OpenAPI.
+    """
+    has_active_subscription: bool
+    subscription_status: Optional[str]
+    days_remaining: Optional[int]
+    features_available: bool
+    message: str
+
 class CreateSubscriptionResponse(BaseModel):
     status: str
     message: str
-    payload: Union[SubscriptionRead, str]
+    payload: SubscriptionPayload
 
 class RetrieveSubscriptionResponse(BaseModel):
     status: str
     message: str
-    payload: Union[SubscriptionRead, List[SubscriptionRead], str]
+    payload: SubscriptionListPayload
 
 class UpdateSubscriptionResponse(BaseModel):
     status: str
     message: str
-    payload: Union[SubscriptionRead, str]
+    payload: SubscriptionPayload
 
 class CancelSubscriptionResponse(BaseModel):
     status: str
     message: str
-    payload: Union[SubscriptionRead, str]
\ No newline at end of file
+    payload: SubscriptionPayload
\ No newline at end of file
@@ -1,33 +1,46 @@
 # schemas/user_metrics_schema.py
-from typing import Optional
+from typing import Annotated, Optional, Union
 import uuid
 from datetime import datetime
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Discriminator, Field, Tag, field_validator
+from utils.schema_utils import payload_kind
+
+# Shared bounds for the numeric body metrics, reused by create and update
+Age = Annotated[int, Field(ge=10, le=120)]
+Weight = Annotated[float, Field(gt=0, le=500)]
+Height = Annotated[float, Field(gt=0, le=300)]
+BodyFat = Annotated[float, Field(ge=3, le=60)]
+
+VALID_GENDERS = ('male', 'female')
+VALID_ACTIVITY_LEVELS = ('sedentary', 'lightly_active', 'moderately_active', 'very_active', 'extra_active')
 
 class UserMetricsCreate(BaseModel):
     """Schema for creating user metrics"""
     gender: str = Field(..., description="User's gender: 'male' or 'female'")
-    age: int = Field(..., ge=10, le=120, description="User's age in years")
-    weight_kg: float = Field(..., gt=0, le=500, description="User's weight in kilograms")
-    height_cm: float = Field(..., gt=0, le=300, description="User's height in centimeters")
-    body_fat_percentage: float = Field(..., ge=3, le=60, description="Body fat percentage (3-60%)")
+    age: Age = Field(..., description="User's age in years")
+    weight_kg: Weight = Field(..., description="User's weight in kilograms")
+    height_cm: Height = Field(..., description="User's height in centimeters")
+    body_fat_percentage: BodyFat = Field(..., description="Body fat percentage (3-60%)")
     activity_level: str = Field(
         default="sedentary",
         description="Activity level: sedentary, lightly_active, moderately_active, very_active, extra_active"
     )
     
-    @validator('gender')
-    def validate_gender(cls, v):
-        if v.lower() not in ['male', 'female']:
+    @field_validator('gender', mode='after')
+    @classmethod
+    def validate_gender(cls, v: str) -> str:
+        v = v.lower()
+        if v not in VALID_GENDERS:
             raise ValueError("Gender must be 'male' or 'female'")
-        return v.lower()
+        return v
     
-    @validator('activity_level')
-    def validate_activity_level(cls, v):
-        valid_levels = ['sedentary', 'lightly_active', 'moderately_active', 'very_active', 'extra_active']
-        if v.lower() not in valid_levels:
-            raise ValueError(f"Activity level must be one of: {', '.join(valid_levels)}")
-        return v.lower()
+    @field_validator('activity_level', mode='after')
+    @classmethod
+    def validate_activity_level(cls, v: str) -> str:
+        v = v.lower()
+        if v not in VALID_ACTIVITY_LEVELS:
+            raise ValueError(f"Activity level must be one of: {', '.join(VALID_ACTIVITY_LEVELS)}")
+        return v
 
 class UserMetricsRead(BaseModel):
     """Schema for reading user metrics"""
@@ -50,41 +63,54 @@ class UserMetricsRead(BaseModel):
 class UserMetricsUpdate(BaseModel):
     """Schema for updating user metrics"""
     gender: Optional[str] = None
-    age: Optional[int] = Field(None, ge=10, le=120)
-    weight_kg: Optional[float] = Field(None, gt=0, le=500)
-    height_cm: Optional[float] = Field(None, gt=0, le=300)
-    body_fat_percentage: Optional[float] = Field(None, ge=3, le=60)
+    age: Optional[Age] = None
+    weight_kg: Optional[Weight] = None
+    height_cm: Optional[Height] = None
+    body_fat_percentage: Optional[BodyFat] = None
     activity_level: Optional[str] = None
     
-    @validator('gender')
-    def validate_gender(cls, v):
-        if v and v.lower() not in ['male', 'female']:
+    @field_validator('gender', mode='after')
+    @classmethod
+    def validate_gender(cls, v: Optional[str]) -> Optional[str]:
+        if not v:
+            return None
+        v = v.lower()
+        if v not in VALID_GENDERS:
             raise ValueError("Gender must be 'male' or 'female'")
-        return v.lower() if v else None
+        return v
     
-    @validator('activity_level')
-    def validate_activity_level(cls, v):
-        if v:
-            valid_levels = ['sedentary', 'lightly_active', 'moderately_active', 'very_active', 'extra_active']
-            if v.lower() not in valid_levels:
-                raise ValueError(f"Activity level must be one of: {', '.join(valid_levels)}")
-            return v.lower()
-        return None
+    @field_validator('activity_level', mode='after')
+    @classmethod
+    def validate_activity_level(cls, v: Optional[str]) -> Optional[str]:
+        if not v:
+            return None
+        v = v.lower()
+        if v not in VALID_ACTIVITY_LEVELS:
+            raise ValueError(f"Activity level must be one of: {', '.join(VALID_ACTIVITY_LEVELS)}")
+        return v
+
+MetricsPayload = Annotated[
+    Union[
+        Annotated[UserMetricsRead, Tag("one")],
+        Annotated[str, Tag("error")],
+    ],
+    Discriminator(payload_kind),
+]
 
 class CreateMetricsResponse(BaseModel):
     """Response schema for metrics creation"""
     status: str
     message: str
-    payload: UserMetricsRead | str
+    payload: MetricsPayload
 
 class RetrieveMetricsResponse(BaseModel):
     """Response schema for retrieving metrics"""
     status: str
     message: str
-    payload: UserMetricsRead | str
+    payload: MetricsPayload
 
 class UpdateMetricsResponse(BaseModel):
     """Response schema for metrics update"""
     status: str
     message: str
-    payload: UserMetricsRead | str
\ No newline at end of file
+    payload: MetricsPayload
\ No newline at end of file
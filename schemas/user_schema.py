@@ -1,5 +1,7 @@
 import uuid
-from pydantic import BaseModel, EmailStr
+from typing import Annotated, Union
+from pydantic import BaseModel, Discriminator, EmailStr, Tag
+from utils.schema_utils import payload_kind
 
     
 class UserCreate(BaseModel):
@@ -11,7 +13,7 @@ class UserRead(BaseModel):
     id: uuid.UUID  
     username: str
     role: str
-    email: EmailStr
+    email: str  # already validated by UserCreate/UserUpdate before it was stored
     device_token: str | None = None
     
 class UserAuthorize(BaseModel):
@@ -43,10 +45,27 @@ class AuthResponse(BaseModel):
     message: str
     payload: str
     
+UserPayload = Annotated[
+    Union[
+        Annotated[UserRead, Tag("one")],
+        Annotated[str, Tag("error")],
+    ],
+    Discriminator(payload_kind),
+]
+
+UserListPayload = Annotated[
+    Union[
+        Annotated[UserRead, Tag("one")],
+        Annotated[list[UserRead], Tag("many")],
+        Annotated[str, Tag("error")],
+    ],
+    Discriminator(payload_kind),
+]
+    
 class RegisterResponse(BaseModel):
     status: str
     message: str
-    payload: UserRead | str
+    payload: UserPayload
     
 class UserUpdate(BaseModel):
     email: EmailStr | None = None
@@ -55,12 +74,12 @@ class UserUpdate(BaseModel):
 class RetrieveUserResponse(BaseModel):
     status: str
     message: str
-    payload: UserRead | list[UserRead] | str
+    payload: UserListPayload
     
 class UpdateAccountResponse(BaseModel):
     status: str
     message: str
-    payload: UserRead | str
+    payload: UserPayload
     
 class DeleteAccountResponse(BaseModel):
     status: str
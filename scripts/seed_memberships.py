@@ -3,76 +3,83 @@ Run this script once to create the initial PLUS and ELITE membership tiers.
 Usage: python scripts/seed_memberships.py
 """
 
+from types import MappingProxyType
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 from connect import SessionLocal
 from models.membership_model import MembershipModel
 from utils.enums import MembershipType, BillingCycle
 
+# Feature payloads are built once at import; each seed row gets a shallow
+# mutable copy since the JSON column expects a plain dict at flush time.
+PLUS_FEATURES = MappingProxyType({
+    "unlimited_meal_planning": True,
+    "wearable_sync": True,
+    "shared_meal_plans": True,
+    "max_shared_users": 3,
+    "custom_templates": 3,
+    "shuffle_mealplans": True,
+    "max_shuffles": 3,
+    "cultural_cuisines": ("Kenyan", "Ethiopian", "Ugandan"),
+    "no_ads": True,
+    "priority_support": False
+})
+
+ELITE_FEATURES = MappingProxyType({
+    "unlimited_meal_planning": True,
+    "wearable_sync": True,
+    "shared_meal_plans": True,
+    "max_shared_users": 5,
+    "custom_templates": "all",
+    "shuffle_mealplans": True,
+    "max_shuffles": 3,
+    "cultural_cuisines": ("all_expanding_monthly",),
+    "no_ads": True,
+    "priority_support": True,
+    "macro_tracking": True,
+    "progress_photos": True,
+    "early_access": True,
+    "recipe_export": True
+})
+
 def seed_memberships():
     db: Session = SessionLocal()
     
     try:
         # Check if memberships already exist
-        existing = db.query(MembershipModel).first()
+        existing = db.execute(select(MembershipModel.id).limit(1)).scalar()
         if existing:
             print("Memberships already exist. Skipping seed.")
             return
         
         # Create PLUS membership
-        plus_membership = MembershipModel(
+        plus_membership = dict(
             membership_type=MembershipType.PLUS,
             membership_name="Utakula Plus",
             membership_description="Perfect for individuals who want to plan meals and track nutrition",
             membership_price=600.00,  # KES 399/month (adjust as needed)
             billing_cycle=BillingCycle.MONTHLY,
-            features={
-                "unlimited_meal_planning": True,
-                "wearable_sync": True,
-                "shared_meal_plans": True,
-                "max_shared_users": 3,
-                "custom_templates": 3,
-                "shuffle_mealplans": True,
-                "max_shuffles": 3,
-                "cultural_cuisines": ["Kenyan", "Ethiopian", "Ugandan"],
-                "no_ads": True,
-                "priority_support": False
-            },
+            features=dict(PLUS_FEATURES),
             is_active=True
         )
         
         # Create ELITE membership
-        elite_membership = MembershipModel(
+        elite_membership = dict(
             membership_type=MembershipType.ELITE,
             membership_name="Utakula Elite",
             membership_description="For families and fitness enthusiasts who want premium features",
             membership_price=800.00,
             billing_cycle=BillingCycle.MONTHLY,
-            features={
-                "unlimited_meal_planning": True,
-                "wearable_sync": True,
-                "shared_meal_plans": True,
-                "max_shared_users": 5,
-                "custom_templates": "all",
-                "shuffle_mealplans": True,
-                "max_shuffles": 3,
-                "cultural_cuisines": ["all_expanding_monthly"],
-                "no_ads": True,
-                "priority_support": True,
-                "macro_tracking": True,
-                "progress_photos": True,
-                "early_access": True,
-                "recipe_export": True
-            },
+            features=dict(ELITE_FEATURES),
             is_active=True
         )
         
-        db.add(plus_membership)
-        db.add(elite_membership)
+        db.execute(insert(MembershipModel), [plus_membership, elite_membership])
         db.commit()
         
         print("✅ Memberships seeded successfully!")
-        print(f"   - {plus_membership.membership_name}: KES {plus_membership.membership_price}/month")
-        print(f"   - {elite_membership.membership_name}: KES {elite_membership.membership_price}/month")
+        print(f"   - {plus_membership['membership_name']}: KES {plus_membership['membership_price']}/month")
+        print(f"   - {elite_membership['membership_name']}: KES {elite_membership['membership_price']}/month")
         
     except Exception as e:
         db.rollback()
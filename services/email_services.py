@@ -1,14 +1,155 @@
+import itertools
+import json
 import os
+import random
+import re
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email import policy
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
 from pathlib import Path
+from string import Formatter
 import logging
 import time
-import uuid
 
 logger = logging.getLogger(__name__)
 
+_FORMATTER = Formatter()
+
+# CRLF output with RFC 2047 headers; 7bit cte_type makes non-ASCII bodies go out as
+# quoted-printable/base64 since servers aren't asked for 8BITMIME. send_message still
+# switches to SMTPUTF8 by itself for non-ASCII addresses.
+_POLICY = policy.SMTP.clone(cte_type="7bit")
+
+# Client-facing messages for SMTP failures, looked up by exception type
+_SMTP_ERROR_MESSAGES = {
+    smtplib.SMTPAuthenticationError: "SMTP authentication failed. Please check email credentials.",
+    smtplib.SMTPRecipientsRefused: "Recipient email address was refused by the mail server.",
+    smtplib.SMTPSenderRefused: "Sender email address was refused by the mail server.",
+    smtplib.SMTPDataError: "The mail server rejected the message.",
+    smtplib.SMTPConnectError: "Could not connect to the mail server.",
+    smtplib.SMTPServerDisconnected: "The mail server closed the connection unexpectedly.",
+}
+_SMTP_DEFAULT_ERROR = "Failed to send email. Please try again later."
+
+# SMTP errors that say the server/session is unhealthy and count towards the circuit
+# breaker. Per-message rejections (refused sender/recipient, DATA rejected, no SMTPUTF8
+# support) are left out so one bad message can't shut mail off for everyone.
+_SERVER_HEALTH_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    smtplib.SMTPHeloError,
+    smtplib.SMTPAuthenticationError,
+)
+
+# Cheap shape check so obviously bad addresses never reach the SMTP server
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+def _log_future_exception(future: Future) -> None:
+    """Done-callback for background sends: log an exception nobody will call result() for"""
+    if future.cancelled():
+        return
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Background email send failed", exc_info=exc)
+
+
+@dataclass
+class SmtpEndpoint:
+    """One SMTP server/account mail can go out through, holding its own persistent session"""
+    host: str
+    port: int
+    sender_email: str
+    sender_password: str = field(repr=False)
+    max_messages: int = 100  # recycle the session after this many sends, like most providers expect
+    timeout: float = 30.0  # socket timeout so a half-open session can't hold the lock forever
+    failure_threshold: int = 5  # consecutive failed sends before the circuit breaker opens
+    reset_timeout: float = 30.0  # first open period in seconds; doubles on every failed probe
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    domain: str = field(init=False)
+    messages_sent: int = field(default=0, init=False)
+    consecutive_failures: int = field(default=0, init=False)
+    _trips: int = field(default=0, init=False, repr=False)
+    _open_until: float = field(default=0.0, init=False, repr=False)
+    _smtp: smtplib.SMTP_SSL | None = field(default=None, init=False, repr=False)
+    
+    def __post_init__(self) -> None:
+        # Domain used in Message-ID headers, derived once from the sender address
+        self.domain = self.sender_email.split('@', 1)[1] if self.sender_email and '@' in self.sender_email else 'utakula.co.ke'
+    
+    def connection(self) -> smtplib.SMTP_SSL:
+        """Return the open SMTP session, reconnecting if the server has dropped it.
+        Callers must hold self.lock."""
+        if self._smtp is not None:
+            try:
+                code, _ = self._smtp.noop()
+                if code == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.discard()
+        
+        server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        try:
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        self._smtp = server
+        self.messages_sent = 0
+        return server
+    
+    def discard(self) -> None:
+        """Close the cached SMTP session without raising. Callers must hold self.lock."""
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+    
+    def available(self) -> bool:
+        """False while the circuit breaker is open; once the open period ends a probe send is let through"""
+        return time.monotonic() >= self._open_until
+    
+    def record_success(self) -> None:
+        """Close the circuit breaker. Callers must hold self.lock."""
+        self.consecutive_failures = 0
+        self._trips = 0
+    
+    def record_failure(self) -> None:
+        """
+        Count a failed send, opening the circuit breaker after failure_threshold in a row.
+        A failed half-open probe reopens it with jittered exponential backoff (capped at an hour).
+        Callers must hold self.lock.
+        """
+        self.consecutive_failures += 1
+        if self.consecutive_failures < self.failure_threshold:
+            return
+        backoff = min(self.reset_timeout * 2 ** self._trips, 3600) + random.uniform(0, 5)
+        self._open_until = time.monotonic() + backoff
+        self._trips += 1
+        self.discard()
+        logger.warning("SMTP endpoint %s:%s keeps failing, pausing sends for %.0fs", self.host, self.port, backoff)
+    
+    def send_message(self, recipient_email: str, message: EmailMessage) -> None:
+        """Send one message over the persistent session. Callers must hold self.lock."""
+        try:
+            self.connection().send_message(message, self.sender_email, recipient_email)
+        except smtplib.SMTPServerDisconnected:
+            # The server closed the session between the NOOP check and the send
+            self.discard()
+            self.connection().send_message(message, self.sender_email, recipient_email)
+        
+        self.messages_sent += 1
+        if self.messages_sent >= self.max_messages:
+            self.discard()
+
 
 class EmailService:
     """Service for sending emails via SMTP"""
@@ -19,65 +160,247 @@ class EmailService:
         self.smtp_server = os.getenv("SMTP_SERVER")
         self.smtp_port = int(os.getenv("SMTP_PORT", 465))
         
+        # SMTP servers to spread sends over; each keeps one authenticated session open
+        self._endpoints = self._load_endpoints()
+        self._endpoint_counter = itertools.count()
+        
+        # Send OTP mail as a single text/html part instead of multipart/alternative
+        self._otp_single_part = os.getenv("OTP_SINGLE_PART", "0") == "1"
+        
+        # Recipient -> monotonic time of the last OTP send, to absorb resend storms
+        self._otp_cooldown = float(os.getenv("OTP_RESEND_COOLDOWN", 3))
+        self._recent_otp_sends: dict[str, float] = {}
+        self._otp_lock = threading.Lock()
+        
         # Path to email templates
         self.templates_dir = Path(__file__).parent / "email_templates"
         
-    def _load_template(self, template_name: str) -> str:
-        """Load HTML email template from file"""
+        # Templates are read from disk once and kept in memory pre-split into
+        # (literal text, placeholder name) chunks
+        self._template_cache: dict[str, tuple[tuple[str, str | None], ...]] = {}
+        
+        # Worker pool for sends whose result the request doesn't need to wait on
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("EMAIL_WORKERS", 4)),
+            thread_name_prefix="email-sender"
+        )
+        
+    def _load_template(self, template_name: str) -> tuple[tuple[str, str | None], ...]:
+        """Load HTML email template split on its {PLACEHOLDER} fields, reading it from file on first use only"""
+        cached = self._template_cache.get(template_name)
+        if cached is not None:
+            return cached
+        
         template_path = self.templates_dir / template_name
+        found = True
         try:
             with open(template_path, 'r', encoding='utf-8') as file:
-                return file.read()
+                template = file.read()
         except FileNotFoundError:
-            logger.error(f"Email template not found: {template_path}")
-            return "<html><body>{CONTENT}</body></html>"
+            logger.error("Email template not found: %s", template_path)
+            template = "<html><body>{CONTENT}</body></html>"
+            found = False
+        
+        parts = tuple((literal, name) for literal, name, _, _ in _FORMATTER.parse(template))
+        if found:
+            self._template_cache[template_name] = parts
+        return parts
     
-    def _send_email(self, recipient_email: str, subject: str, html_body: str, text_body: str) -> dict:
-        """Generic helper to send email via SMTP"""
-        try:
-            # Create the email message
-            message = MIMEMultipart("alternative")
-            message["From"] = self.sender_email
-            message["To"] = recipient_email
-            message["Subject"] = subject
-            
-            # Add headers to improve deliverability
-            domain = self.sender_email.split('@')[1] if '@' in self.sender_email else 'utakula.co.ke'
-            message["Message-ID"] = f"<{uuid.uuid4()}@{domain}>"
-            message["Date"] = time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime())
-            
-            # Attach both plain text and HTML versions
-            part1 = MIMEText(text_body, "plain", "utf-8")
-            part2 = MIMEText(html_body, "html", "utf-8")
-            
-            message.attach(part1)
-            message.attach(part2)
-            
-            # Send email via SMTP
-            with smtplib.SMTP_SSL(self.smtp_server, self.smtp_port) as server:
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(
-                    self.sender_email,
-                    recipient_email,
-                    message.as_string()
+    def _render_template(self, template_name: str, **fields: str) -> str:
+        """Fill a template's placeholders like str.format; ones with no matching field render empty"""
+        return "".join([
+            literal + fields.get(name, "") if name is not None else literal
+            for literal, name in self._load_template(template_name)
+        ])
+    
+    def _load_endpoints(self) -> list[SmtpEndpoint]:
+        """
+        Read SMTP_SERVERS_JSON, a list of {"host", "port", "email", "password"} objects,
+        falling back to the single SMTP_SERVER/SMTP_EMAIL configuration.
+        """
+        max_messages = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", 100))
+        timeout = float(os.getenv("SMTP_TIMEOUT", 30))
+        failure_threshold = int(os.getenv("SMTP_BREAKER_THRESHOLD", 5))
+        reset_timeout = float(os.getenv("SMTP_BREAKER_RESET_TIMEOUT", 30))
+        servers_json = os.getenv("SMTP_SERVERS_JSON")
+        if servers_json:
+            return [
+                SmtpEndpoint(
+                    host=server["host"],
+                    port=int(server.get("port", 465)),
+                    sender_email=server["email"],
+                    sender_password=server["password"],
+                    max_messages=max_messages,
+                    timeout=timeout,
+                    failure_threshold=failure_threshold,
+                    reset_timeout=reset_timeout
                 )
+                for server in json.loads(servers_json)
+            ]
+        return [SmtpEndpoint(
+            host=self.smtp_server,
+            port=self.smtp_port,
+            sender_email=self.sender_email,
+            sender_password=self.sender_password,
+            max_messages=max_messages,
+            timeout=timeout,
+            failure_threshold=failure_threshold,
+            reset_timeout=reset_timeout
+        )]
+    
+    def _acquire_endpoint(self) -> SmtpEndpoint:
+        """
+        Take the next idle endpoint in round-robin order, locked for the caller,
+        passing over endpoints whose circuit breaker is open while any other is usable.
+        If every candidate is busy, wait for the one whose turn it is.
+        """
+        start = next(self._endpoint_counter)
+        count = len(self._endpoints)
+        ordered = [self._endpoints[(start + offset) % count] for offset in range(count)]
+        candidates = [endpoint for endpoint in ordered if endpoint.available()] or ordered
+        for endpoint in candidates:
+            if endpoint.lock.acquire(blocking=False):
+                return endpoint
+        
+        endpoint = candidates[0]
+        endpoint.lock.acquire()
+        return endpoint
+    
+    def _claim_otp_slot(self, recipient_email: str) -> bool:
+        """Reserve an OTP send for this recipient, or return False if one went out within the cooldown"""
+        key = recipient_email.lower()
+        now = time.monotonic()
+        with self._otp_lock:
+            sent_at = self._recent_otp_sends.get(key)
+            if sent_at is not None and now - sent_at < self._otp_cooldown:
+                return False
+            if len(self._recent_otp_sends) >= 1024:
+                self._recent_otp_sends = {
+                    email: ts for email, ts in self._recent_otp_sends.items()
+                    if now - ts < self._otp_cooldown
+                }
+            self._recent_otp_sends[key] = now
+            return True
+    
+    def _release_otp_slot(self, recipient_email: str) -> None:
+        """Drop a reservation after a failed send so the user can retry straight away"""
+        with self._otp_lock:
+            self._recent_otp_sends.pop(recipient_email.lower(), None)
+    
+    def send_in_background(self, send_method, *args, **kwargs) -> Future:
+        """
+        Queue one of the send_* methods on the worker pool and return at once.
+        Send failures are logged by _deliver; anything unexpected the method raises
+        is logged from the future so it doesn't vanish unobserved.
+        """
+        future = self._executor.submit(send_method, *args, **kwargs)
+        future.add_done_callback(_log_future_exception)
+        return future
+    
+    def close(self) -> None:
+        """Flush queued sends and close the SMTP sessions, e.g. on application shutdown"""
+        self._executor.shutdown(wait=True)
+        for endpoint in self._endpoints:
+            with endpoint.lock:
+                endpoint.discard()
+    
+    def _invalid_recipient(self, recipient_email: str, subject: str) -> dict | None:
+        """Return an error result for an address that is obviously not deliverable, else None"""
+        if recipient_email and _EMAIL_RE.match(recipient_email):
+            return None
+        logger.warning("Refusing to send email '%s' to invalid address %r", subject, recipient_email)
+        return {
+            "status": "error",
+            "message": "Invalid recipient email address"
+        }
+    
+    def _build_message(self, endpoint: SmtpEndpoint, recipient_email: str, subject: str, html_body: str, text_body: str | None) -> EmailMessage:
+        """Assemble the message; raises ValueError for content that can't go in a header (e.g. a newline in the subject)"""
+        message = EmailMessage(policy=_POLICY)
+        if text_body is None:
+            message.set_content(html_body, subtype="html")
+        else:
+            # Plain text first, HTML as the preferred alternative
+            message.set_content(text_body)
+            message.add_alternative(html_body, subtype="html")
+        
+        # From and Message-ID follow the endpoint's account to keep SPF/DKIM alignment
+        message["From"] = endpoint.sender_email
+        message["To"] = recipient_email
+        message["Subject"] = subject
+        message["Message-ID"] = make_msgid(domain=endpoint.domain)
+        message["Date"] = formatdate(usegmt=True)
+        return message
+    
+    def _deliver(self, endpoint: SmtpEndpoint, recipient_email: str, subject: str, html_body: str, text_body: str | None) -> dict:
+        """Build and send one message through an endpoint the caller has already locked"""
+        # Bad input is this message's problem, not the server's, so it never reaches the breaker
+        try:
+            message = self._build_message(endpoint, recipient_email, subject, html_body, text_body)
+        except Exception as e:
+            logger.error("Could not build email '%s' to %s: %s", subject, recipient_email, e)
+            return {
+                "status": "error",
+                "message": "Email could not be composed from the given details."
+            }
+        
+        if not endpoint.available():
+            # Fail fast instead of handshaking with a server that keeps failing
+            logger.warning("Not sending email '%s' to %s: SMTP circuit breaker is open", subject, recipient_email)
+            return {
+                "status": "error",
+                "message": "Email service is temporarily unavailable. Please try again later."
+            }
+        
+        try:
+            endpoint.send_message(recipient_email, message)
+            endpoint.record_success()
             
-            logger.info(f"Email '{subject}' sent successfully to {recipient_email}")
+            logger.info("Email '%s' sent successfully to %s", subject, recipient_email)
             return {
                 "status": "success",
                 "message": f"Email sent successfully to {recipient_email}"
             }
+        except smtplib.SMTPException as e:
+            logger.error("SMTP error sending email '%s' to %s: %s", subject, recipient_email, e)
+            if isinstance(e, _SERVER_HEALTH_ERRORS):
+                endpoint.record_failure()
+            return {
+                "status": "error",
+                "message": _SMTP_ERROR_MESSAGES.get(type(e), _SMTP_DEFAULT_ERROR)
+            }
+        except OSError as e:
+            # Socket-level failure: refused connection, timeout, TLS error
+            logger.error("Network error sending email '%s' to %s: %s", subject, recipient_email, e)
+            endpoint.record_failure()
+            return {
+                "status": "error",
+                "message": str(e)
+            }
         except Exception as e:
-            logger.error(f"Error sending email '{subject}' to {recipient_email}: {str(e)}")
+            logger.error("Error sending email '%s' to %s: %s", subject, recipient_email, e)
             return {
                 "status": "error",
                 "message": str(e)
             }
+    
+    def _send_email(self, recipient_email: str, subject: str, html_body: str, text_body: str | None) -> dict:
+        """Generic helper to send email via SMTP. Without a text_body the HTML is sent as a single part."""
+        invalid = self._invalid_recipient(recipient_email, subject)
+        if invalid:
+            return invalid
+        
+        # Send through the next free SMTP endpoint
+        endpoint = self._acquire_endpoint()
+        try:
+            return self._deliver(endpoint, recipient_email, subject, html_body, text_body)
+        finally:
+            endpoint.lock.release()
 
     def send_support_email(self, recipient_email: str, user_name: str, user_email: str, subject: str, message: str) -> dict:
         """Send support request to the support team"""
-        template = self._load_template("support_request_template.html")
-        html_body = template.format(
+        html_body = self._render_template(
+            "support_request_template.html",
             USER_NAME=user_name,
             USER_EMAIL=user_email,
             SUBJECT=subject,
@@ -89,8 +412,8 @@ class EmailService:
 
     def send_acknowledgment_email(self, recipient_email: str, user_name: str, subject: str, message: str) -> dict:
         """Send acknowledgment email to the user"""
-        template = self._load_template("support_acknowledgment_template.html")
-        html_body = template.format(
+        html_body = self._render_template(
+            "support_acknowledgment_template.html",
             USER_NAME=user_name,
             SUBJECT=subject,
             MESSAGE=message
@@ -101,14 +424,68 @@ class EmailService:
 
     def send_OTP_via_SMTP(self, recipient_email: str, otp: str):
         """Send OTP to user's email via SMTP"""
-        template = self._load_template("otp_email_template.html")
-        html_body = template.replace("{OTP_CODE}", otp)
-        text_body = f"Your Utakula verification code is: {otp}"
-        return self._send_email(recipient_email, "Your Utakula OTP Code", html_body, text_body)
+        if not self._claim_otp_slot(recipient_email):
+            # The previous code is still the stored one, so the user should use that email
+            logger.info("Skipping duplicate OTP send to %s within cooldown", recipient_email)
+            return {
+                "status": "throttled",
+                "message": "A code was just sent to this address. Please check your inbox or try again in a few seconds."
+            }
+        
+        html_body = self._render_template("otp_email_template.html", OTP_CODE=otp)
+        text_body = None if self._otp_single_part else f"Your Utakula verification code is: {otp}"
+        result = self._send_email(recipient_email, "Your Utakula OTP Code", html_body, text_body)
+        if result["status"] != "success":
+            self._release_otp_slot(recipient_email)
+        return result
+
+    def _welcome_content(self, username: str) -> tuple[str, str, str]:
+        """Subject, HTML body and text body of the welcome email for one user"""
+        html_body = self._render_template("welcome_email_template.html", USER_NAME=username)
+        text_body = f"Welcome to Utakula, {username}! We're thrilled to have you join the family."
+        return f"Welcome to Utakula, {username}! 🎉", html_body, text_body
 
     def send_welcome_email(self, recipient_email: str, username: str) -> dict:
         """Send welcome email to new users"""
-        template = self._load_template("welcome_email_template.html")
-        html_body = template.format(USER_NAME=username)
-        text_body = f"Welcome to Utakula, {username}! We're thrilled to have you join the family."
-        return self._send_email(recipient_email, f"Welcome to Utakula, {username}! 🎉", html_body, text_body)
+        return self._send_email(recipient_email, *self._welcome_content(username))
+
+    def send_welcome_batch(self, recipients: list[tuple[str, str]]) -> list[dict]:
+        """
+        Send welcome emails to (email, username) pairs over the endpoints' persistent sessions.
+        The endpoint lock is taken per message so OTP sends can interleave with a long batch.
+        A refused recipient doesn't end the batch, but once more than a third of the
+        attempted sends have failed the rest are skipped, as the server is likely at fault.
+        Returns one result per recipient, in input order.
+        """
+        results: list[dict] = []
+        attempted = failed = skipped = 0
+        for recipient_email, username in recipients:
+            if attempted >= 3 and failed * 3 > attempted:
+                results.append({
+                    "status": "error",
+                    "message": "Skipped after repeated send failures in this batch"
+                })
+                skipped += 1
+                continue
+            
+            subject, html_body, text_body = self._welcome_content(username)
+            result = self._invalid_recipient(recipient_email, subject)
+            if result is None:
+                endpoint = self._acquire_endpoint()
+                try:
+                    result = self._deliver(endpoint, recipient_email, subject, html_body, text_body)
+                finally:
+                    endpoint.lock.release()
+                attempted += 1
+                if result["status"] != "success":
+                    failed += 1
+            results.append(result)
+        
+        if skipped:
+            logger.error("Welcome batch aborted: %d of %d sends failed, %d skipped", failed, attempted, skipped)
+        return results
+
+
+# Shared instance so every caller reuses the same SMTP sessions and worker pool;
+# main.py closes it on shutdown
+email_service = EmailService()
@@ -1,4 +1,4 @@
-from services.email_services import EmailService
+from services.email_services import email_service
 from schemas.support_schema import SupportRequest
 import logging
 
@@ -8,7 +8,7 @@ class SupportService:
     """Service to handle help and support requests"""
     
     def __init__(self):
-        self.email_service = EmailService()
+        self.email_service = email_service
         self.support_email = "support@utakula.co.ke"
 
     def process_support_request(self, request: SupportRequest) -> dict:
@@ -32,20 +32,16 @@ class SupportService:
                 # Probably better to return error if team doesn't get it.
                 return team_res
 
-            # 2. Send acknowledgment to user
-            user_res = self.email_service.send_acknowledgment_email(
+            # 2. Queue acknowledgment to user. Its outcome doesn't change the response,
+            # so it goes out on the email worker pool; failures are logged there.
+            self.email_service.send_in_background(
+                self.email_service.send_acknowledgment_email,
                 recipient_email=request.email,
                 user_name=request.name,
                 subject=request.subject,
                 message=request.message
             )
             
-            if user_res["status"] == "error":
-                logger.warning(f"Failed to send acknowledgment email to user: {user_res['message']}")
-                # We don't necessarily want to fail the whole request if only the acknowledgment fails,
-                # but we should let the caller know if needed. 
-                # For now, we'll return success if the team got the message.
-            
             return {
                 "status": "success",
                 "message": "Support request submitted successfully."
@@ -1,10 +1,18 @@
 import base64
-import json
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
 from fastapi import HTTPException, status
 import jwt
+import orjson
 import os
 import firebase_admin
 from firebase_admin import credentials
+import google.auth.exceptions
+from google.auth import jwt as google_jwt
+from google.auth.transport import requests as google_requests
 import logging
 import requests
 from typing import Dict
@@ -12,17 +20,85 @@ from typing import Dict
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Issuers Google signs ID tokens with
+_VALID_ISSUERS = frozenset({'accounts.google.com', 'https://accounts.google.com'})
+
+# Service account JSON for the Firebase Admin SDK; override with FIREBASE_CRED_PATH
+_DEFAULT_FIREBASE_CRED_PATH = "/home/jeromemugita/Documents/Code/utakula_server_v2/firebaseCreds.json"
+_INITIALIZED = False
+
+# Recently validated app JWTs -> (payload, cache expiry), shared by every HelperUtils
+# instance. Entries never outlive the token's own exp claim.
+_JWT_CACHE_TTL = 60
+_JWT_CACHE_MAXSIZE = 8192
+_jwt_cache: "OrderedDict[str, tuple[dict, float]]" = OrderedDict()
+_jwt_cache_lock = threading.Lock()
+
+# Verified Google ID token claims keyed by sha256(token) -> (payload, token exp)
+_GOOGLE_ID_CACHE_MAXSIZE = 4096
+_google_id_cache: "OrderedDict[str, tuple[dict, float]]" = OrderedDict()
+_google_id_cache_lock = threading.Lock()
+
+# google-auth transport on a persistent session, used to fetch Google's signing certs
+_google_request = google_requests.Request(session=requests.Session())
+
+# Google's ID token signing certs (kid -> PEM), kept until their Cache-Control max-age
+# runs out so a sign-in is a local RSA check. An unknown kid forces a refetch, at most
+# once per _GOOGLE_CERTS_MIN_REFRESH seconds so forged kids can't make every call fetch.
+_GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+_GOOGLE_CERTS_DEFAULT_MAX_AGE = 300
+_GOOGLE_CERTS_MIN_REFRESH = 60
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+_google_certs: dict[str, str] = {}
+_google_certs_expiry = 0.0
+_google_certs_fetched_at = 0.0
+_google_certs_lock = threading.Lock()
+
+def _b64url_decode(segment: str) -> bytes:
+    """Decode one JWT segment, restoring the stripped base64 padding"""
+    segment_b = segment.encode()
+    return base64.urlsafe_b64decode(segment_b + b"=" * (-len(segment_b) % 4))
+
+def _get_google_certs(refresh: bool = False) -> dict[str, str]:
+    """Return Google's signing certs, fetching them only when expired (or on a rate-limited refresh)"""
+    global _google_certs, _google_certs_expiry, _google_certs_fetched_at
+    with _google_certs_lock:
+        now = time.time()
+        if _google_certs and now < _google_certs_expiry:
+            if not refresh or now - _google_certs_fetched_at < _GOOGLE_CERTS_MIN_REFRESH:
+                return _google_certs
+        
+        response = _google_request(_GOOGLE_CERTS_URL, method="GET")
+        if response.status != 200:
+            raise google.auth.exceptions.TransportError(
+                f"Could not fetch Google certs: HTTP {response.status}"
+            )
+        match = _MAX_AGE_RE.search(response.headers.get("cache-control", ""))
+        _google_certs = orjson.loads(response.data)
+        _google_certs_fetched_at = now
+        _google_certs_expiry = now + (int(match.group(1)) if match else _GOOGLE_CERTS_DEFAULT_MAX_AGE)
+        return _google_certs
+
 class HelperUtils:
     def __init__(self) -> None:
         self.secret_key = os.getenv("ACCESS_SECRET")
         self.algorithm = "HS256"
-        self.google_client_id = os.getenv("GOOGLE_CLIENT_ID")  # Add this to your .env
+        self.google_client_id = os.getenv("GOOGLE_CLIENT_ID")  # Required for Google sign-in
 
     def validate_JWT(self, token: str):
         """Validate JWT token issued by your application."""
+        now = time.time()
+        with _jwt_cache_lock:
+            cached = _jwt_cache.get(token)
+            if cached is not None:
+                payload, expires_at = cached
+                if now < expires_at:
+                    _jwt_cache.move_to_end(token)
+                    return payload
+                del _jwt_cache[token]
+        
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            return payload  
         except jwt.ExpiredSignatureError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -33,34 +109,69 @@ class HelperUtils:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
+        
+        expires_at = now + _JWT_CACHE_TTL
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+        with _jwt_cache_lock:
+            _jwt_cache[token] = (payload, expires_at)
+            if len(_jwt_cache) > _JWT_CACHE_MAXSIZE:
+                _jwt_cache.popitem(last=False)
+        return payload
             
     def initialize_firebase(self):
         """Initialize Firebase Admin SDK."""
+        global _INITIALIZED
+        if _INITIALIZED:
+            logger.info("Firebase Admin SDK already initialized")
+            return
+        
         logger.info("Initializing Firebase Admin SDK")
         try:
-            if not firebase_admin._apps:
-                cred = credentials.Certificate("/home/jeromemugita/Documents/Code/utakula_server_v2/firebaseCreds.json")
-                firebase_admin.initialize_app(cred)
-                logger.info("Firebase Admin SDK initialized successfully")
-            else:
-                logger.info("Firebase Admin SDK already initialized")
+            cred_path = os.getenv("FIREBASE_CRED_PATH", _DEFAULT_FIREBASE_CRED_PATH)
+            with open(cred_path, "rb") as f:
+                cred = credentials.Certificate(orjson.loads(f.read()))
+            firebase_admin.initialize_app(cred)
+            _INITIALIZED = True
+            logger.info("Firebase Admin SDK initialized successfully")
         except Exception as e:
-            logger.error(f"Error initializing Firebase Admin SDK: {str(e)}")
+            logger.error("Error initializing Firebase Admin SDK: %s", e)
             
-    @staticmethod
-    def decode_google_jwt(token: str) -> Dict:
+    def decode_google_jwt(self, token: str) -> Dict:
         """
         Decode and validate Google ID token.
         
         This method:
-        1. Decodes the JWT without verification (to extract claims)
-        2. Validates the issuer
-        3. Optionally validates with Google's tokeninfo endpoint
+        1. Decodes the JWT without verification (cheap format and issuer pre-check)
+        2. Verifies signature, expiry and audience (GOOGLE_CLIENT_ID) with google-auth
+           against Google's cached signing certs
         
-        For production, you should use google-auth library for proper validation.
+        Verified claims are cached by token hash until the token expires.
+        Without GOOGLE_CLIENT_ID every token is rejected, since google-auth would
+        otherwise skip the audience check and accept tokens minted for any client.
         """
         logger.info("Decoding Google JWT token")
         
+        if not self.google_client_id:
+            logger.error("GOOGLE_CLIENT_ID is not configured; refusing Google sign-in")
+            return {
+                "status": "error",
+                "message": "Google sign-in is not configured",
+            }
+        
+        key = hashlib.sha256(token.encode()).hexdigest()
+        with _google_id_cache_lock:
+            cached = _google_id_cache.get(key)
+            if cached is not None:
+                payload, expires_at = cached
+                if time.time() < expires_at:
+                    _google_id_cache.move_to_end(key)
+                    return {
+                        'status': 'success',
+                        'data': payload,
+                    }
+                del _google_id_cache[key]
+        
         try:
             # Split token into parts
             parts = token.split(".")
@@ -72,41 +183,38 @@ class HelperUtils:
                 }
 
             # Decode the payload (middle part)
-            base64_url = parts[1]
-
-            # Replace URL-safe characters
-            base64_str = base64_url.replace("-", "+").replace("_", "/")
-
-            # Add padding
-            padding = 4 - len(base64_str) % 4
-            if padding != 4:
-                base64_str += "=" * padding
-
-            # Decode base64
-            decoded_bytes = base64.b64decode(base64_str)
-
-            # Parse JSON
-            payload = json.loads(decoded_bytes.decode('utf-8'))
+            payload = orjson.loads(_b64url_decode(parts[1]))
             
-            logger.info(f"Token decoded for email: {payload.get('email')}")
+            logger.info("Token decoded for email: %s", payload.get('email'))
 
             # Validate issuer
-            valid_issuers = ['accounts.google.com', 'https://accounts.google.com']
-            if payload.get('iss') not in valid_issuers:
-                logger.error(f"Invalid issuer: {payload.get('iss')}")
+            if payload.get('iss') not in _VALID_ISSUERS:
+                logger.error("Invalid issuer: %s", payload.get('iss'))
                 return {
                     "status": "error",
                     "message": "Invalid token issuer",
                 }
 
-            # Optional: Verify token with Google (recommended for production)
-            # Uncomment if you want additional verification
-            # verification_result = HelperUtils._verify_token_with_google(token)
-            # if not verification_result:
-            #     return {
-            #         "status": "error",
-            #         "message": "Token verification with Google failed",
-            #     }
+            # Verify signature, expiry and audience; returns the verified claims
+            try:
+                certs = _get_google_certs()
+                if orjson.loads(_b64url_decode(parts[0])).get('kid') not in certs:
+                    # Google may have rotated keys since the certs were fetched
+                    certs = _get_google_certs(refresh=True)
+                payload = google_jwt.decode(token, certs=certs, audience=self.google_client_id)
+                if payload.get('iss') not in _VALID_ISSUERS:
+                    raise ValueError(f"Wrong issuer: {payload.get('iss')}")
+            except (ValueError, google.auth.exceptions.GoogleAuthError) as e:
+                logger.error("Google token verification failed: %s", e)
+                return {
+                    "status": "error",
+                    "message": "Token verification with Google failed",
+                }
+
+            with _google_id_cache_lock:
+                _google_id_cache[key] = (payload, float(payload["exp"]))
+                if len(_google_id_cache) > _GOOGLE_ID_CACHE_MAXSIZE:
+                    _google_id_cache.popitem(last=False)
 
             logger.info("Token validation successful")
             return {
@@ -114,14 +222,14 @@ class HelperUtils:
                 'data': payload,
             }
             
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {str(e)}")
+        except orjson.JSONDecodeError as e:
+            logger.error("JSON decode error: %s", e)
             return {
                 "status": "error",
                 "message": f"Failed to parse token: {str(e)}",
             }
         except base64.binascii.Error as e:
-            logger.error(f"Base64 decode error: {str(e)}")
+            logger.error("Base64 decode error: %s", e)
             return {
                 "status": "error",
                 "message": f"Invalid token encoding: {str(e)}",
@@ -132,32 +240,3 @@ class HelperUtils:
                 "status": "error",
                 "message": f"Error decoding token: {str(e)}",
             }
-    
-    @staticmethod
-    def _verify_token_with_google(token: str) -> bool:
-        """
-        Verify token with Google's tokeninfo endpoint.
-        
-        This provides additional security by validating the token with Google's servers.
-        Recommended for production use.
-        """
-        try:
-            response = requests.get(
-                f'https://oauth2.googleapis.com/tokeninfo?id_token={token}',
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                token_info = response.json()
-                logger.info(f"Google token verification successful for: {token_info.get('email')}")
-                return True
-            else:
-                logger.error(f"Google token verification failed: {response.status_code}")
-                return False
-                
-        except requests.RequestException as e:
-            logger.error(f"Network error during token verification: {str(e)}")
-            return False
-        except Exception as e:
-            logger.exception("Unexpected error during token verification")
-            return False
\ No newline at end of file
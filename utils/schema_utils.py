@@ -0,0 +1,12 @@
+from typing import Any
+
+def payload_kind(value: Any) -> str:
+    """
+    Tag a response payload by shape so validation dispatches straight to one variant.
+    Used as the Discriminator for the "<Read> | list[<Read>] | str" response payloads.
+    """
+    if isinstance(value, str):
+        return "error"
+    if isinstance(value, list):
+        return "many"
+    return "one"